@@ -13,6 +13,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_data(show_spinner=False)
+def _corpus_stats(store_id, doc_count):
+    """Document/chunk counts, cached so Streamlit reruns skip the per-doc loop.
+
+    Keyed on the store's id and document count, which change whenever the
+    data is (re)loaded.
+    """
+    store = st.session_state.vector_store
+    return len(store.documents), store.total_chunks
+
 # Initialize session states if they don't exist
 if 'gemini_api_key' not in st.session_state:
     st.session_state.gemini_api_key = ""
@@ -40,8 +50,10 @@ with st.sidebar:
     if api_key != st.session_state.gemini_api_key:
         st.session_state.gemini_api_key = api_key
         
-        # Reset RAG engine if API key changes
-        st.session_state.rag_engine = None
+        # Re-point the existing engine at the new key; the model factory
+        # is memoized, so this skips SDK setup instead of rebuilding
+        if st.session_state.rag_engine:
+            st.session_state.rag_engine.set_api_key(api_key)
         st.success("Password berhasil di submit")
     
     # Load data button
@@ -54,8 +66,10 @@ with st.sidebar:
                 st.session_state.vector_store.load_documents()
                 
                 # Show success message with document count
-                doc_count = len(st.session_state.vector_store.documents)
-                chunk_count = sum(len(doc["chunks"]) for doc in st.session_state.vector_store.documents)
+                doc_count, chunk_count = _corpus_stats(
+                    id(st.session_state.vector_store),
+                    len(st.session_state.vector_store.documents)
+                )
                 st.success(f"Successfully loaded {doc_count} documents with {chunk_count} chunks!")
                 
                 # Initialize RAG engine if we have a key
@@ -69,8 +83,12 @@ with st.sidebar:
     
     # Show data stats if loaded
     if st.session_state.vector_store and st.session_state.vector_store.documents:
-        st.metric("Documents Loaded", len(st.session_state.vector_store.documents))
-        st.metric("Total Chunks", sum(len(doc["chunks"]) for doc in st.session_state.vector_store.documents))
+        doc_count, chunk_count = _corpus_stats(
+            id(st.session_state.vector_store),
+            len(st.session_state.vector_store.documents)
+        )
+        st.metric("Documents Loaded", doc_count)
+        st.metric("Total Chunks", chunk_count)
     
     st.divider()
     st.markdown("### About")
@@ -119,20 +137,25 @@ else:
     if st.button("Buat Jawaban"):
         if query:
             with st.spinner("Lagi Mikir........"):
-                # Get response from RAG engine
-                response = st.session_state.rag_engine.generate_response(
-                    query, 
-                    num_results=num_results
-                )
-                
-                # Display response
+                # Stream the response from the RAG engine
                 st.subheader("Answer")
-                st.markdown(response["answer"])
+                placeholder = st.empty()
+                answer = ""
+                sources = []
+                for event in st.session_state.rag_engine.stream_response(
+                    query,
+                    num_results=num_results
+                ):
+                    if "sources" in event:
+                        sources = event["sources"]
+                    if event.get("delta"):
+                        answer += event["delta"]
+                        placeholder.markdown(answer)
                 
                 # Display sources if requested
-                if show_sources and response["sources"]:
+                if show_sources and sources:
                     st.subheader("Sources")
-                    for i, source in enumerate(response["sources"]):
+                    for i, source in enumerate(sources):
                         with st.expander(f"Source {i+1}: {os.path.basename(source['source'])}"):
                             st.write(f"**Source:** {source['source']}")
                             st.write(f"**Pages:** {source['metadata']['page_start']}-{source['metadata']['page_end']}")
@@ -1,5 +1,9 @@
 import os
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
 import google.generativeai as genai
 
 # Configure logging
@@ -10,29 +14,168 @@ logging.basicConfig(
 )
 logger = logging.getLogger("RAGEngine")
 
+@lru_cache(maxsize=256)
+def _basename(path):
+    """Cached os.path.basename; the same source path repeats across chunks."""
+    return os.path.basename(path)
+
+@lru_cache(maxsize=8)
+def _get_model(model_name):
+    """Build a GenerativeModel, memoized per model name.
+
+    GenerativeModel construction does discovery/handshake work; reusing the
+    instance across Streamlit reruns skips it. SDK credentials are
+    process-global and read at call time, so they are deliberately not part
+    of the cache key -- callers must genai.configure before each use.
+    """
+    return genai.GenerativeModel(model_name)
+
+# Static prompt text is built once; each call is a single %-substitution,
+# and the constant prefix stays byte-identical across requests, which also
+# helps any provider-side prefix caching
+_PROMPT_TEMPLATE = """Anda adalah asisten hukum yang ahli dalam hukum Indonesia. Berdasarkan dokumen-dokumen berikut, berikan jawaban yang relevan, jelas, dan mudah dipahami.
+
+%s
+
+Silakan jawab pertanyaan di bawah ini berdasarkan informasi yang terdapat dalam dokumen di atas. Anda boleh menyusun ulang kalimat dengan bahasa Anda sendiri selama maknanya tetap sesuai dengan dokumen. Jangan menambahkan informasi dari luar dokumen. Jika dokumen tidak memuat informasi yang cukup, sampaikan bahwa jawabannya tidak tersedia.
+
+Question: %s
+
+Answer:"""
+
+
+class BatchedGemini:
+    """Coalesce concurrent Gemini requests into one dispatch window.
+
+    Prompts arriving within `window_ms` of each other are pulled off a
+    queue and dispatched together. Gemini has no true batch endpoint, so
+    the batch goes out as a single asyncio.gather of async calls; each
+    submitter awaits its own future. Under multi-user load this keeps
+    concurrent requests in flight together instead of serializing them.
+    """
+
+    def __init__(self, model, window_ms=50, max_batch=8):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._loop = None
+        self._queue = None
+        self._runner = None
+
+    async def submit(self, prompt):
+        """Queue a prompt and wait for its response object."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # Bind (or rebind) to the running loop; Streamlit drives each
+            # interaction through its own asyncio.run. Cancel the previous
+            # runner so the dead loop's task is not left pending forever.
+            if self._runner is not None:
+                self._runner.cancel()
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._runner = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch in its own task so the runner goes straight back to
+            # draining the queue; awaiting here would head-of-line block
+            # every prompt arriving after this window behind the slowest
+            # in-flight response
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        # Prompts whose submitter already gave up (wait_for cancelled the
+        # future) are dropped here, before paying for their API calls
+        batch = [(prompt, future) for prompt, future in batch
+                 if not future.cancelled()]
+        if not batch:
+            return
+        responses = await asyncio.gather(
+            *(self.model.generate_content_async(prompt) for prompt, _ in batch),
+            return_exceptions=True
+        )
+        for (_, future), response in zip(batch, responses):
+            if future.cancelled():
+                continue
+            if isinstance(response, Exception):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
 class RAGEngine:
-    def __init__(self, vector_store, api_key):
+    def __init__(self, vector_store, api_key, request_timeout=10.0, max_retries=3):
         """Initialize the RAG engine.
         
         Args:
             vector_store (VectorStore): Vector store for document retrieval
             api_key (str): Gemini API key
+            request_timeout (float): Seconds to wait for a Gemini response
+                before retrying; "thinking" models have high tail-latency
+                variance, so retrying a straggler is usually faster than
+                waiting it out
+            max_retries (int): Number of attempts per request
         """
         self.vector_store = vector_store
         self.api_key = api_key
         self.model_name = "gemini-2.0-flash-thinking-exp-01-21"
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        # Sized so every retry attempt gets a worker even when earlier
+        # attempts are stuck on a hung call
+        self._executor = ThreadPoolExecutor(max_workers=max(2, max_retries))
         
-        # Initialize Gemini client
+        # Initialize Gemini client (model instance cached across engines)
         try:
             genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(self.model_name)
+            self.model = _get_model(self.model_name)
+            self._batcher = BatchedGemini(self.model)
             logger.info("Initialized Gemini client")
         except Exception as e:
             logger.error(f"Error initializing Gemini client: {str(e)}")
             self.model = None
+            self._batcher = None
     
-    def generate_response(self, query, num_results=3):
+    def set_api_key(self, api_key):
+        """Switch to another API key without rebuilding the engine.
+
+        The vector store and retrieval state are untouched; the model comes
+        from the memoized factory. genai.configure must run every time
+        because the SDK holds credentials process-globally, not on the
+        model instance.
+
+        Args:
+            api_key (str): Gemini API key
+        """
+        self.api_key = api_key
+        try:
+            genai.configure(api_key=api_key)
+            self.model = _get_model(self.model_name)
+            self._batcher = BatchedGemini(self.model)
+        except Exception as e:
+            logger.error(f"Error initializing Gemini client: {str(e)}")
+            self.model = None
+            self._batcher = None
+
+    async def agenerate_response(self, query, num_results=3):
         """Generate a response using RAG.
+
+        Retrieval runs in a worker thread and the Gemini call goes through
+        the async client, so both can overlap with other coroutines instead
+        of blocking the event loop.
         
         Args:
             query (str): User query
@@ -49,8 +192,10 @@ class RAGEngine:
             }
         
         try:
-            # Retrieve relevant documents
-            relevant_docs = self.vector_store.similarity_search(query, top_k=num_results)
+            # Retrieve relevant documents off the event loop
+            relevant_docs = await asyncio.to_thread(
+                self.vector_store.similarity_search, query, num_results
+            )
             
             if not relevant_docs:
                 logger.warning("No relevant documents found for query")
@@ -66,7 +211,7 @@ class RAGEngine:
             prompt = self._create_prompt(query, context)
             
             # Generate response using Gemini
-            response = self._generate_with_gemini(prompt)
+            response = await self._agenerate_with_gemini(prompt)
             
             logger.info(f"Generated response for query: {query[:50]}...")
             
@@ -82,6 +227,48 @@ class RAGEngine:
                 "sources": []
             }
     
+
+    def stream_response(self, query, num_results=3):
+        """Generate a response using RAG, streaming the answer as it arrives.
+
+        Yields dicts: first {"sources": [...]} once retrieval finishes, then
+        {"delta": str} for each streamed piece of the answer, so the UI can
+        render tokens at time-to-first-token instead of waiting for the
+        full completion.
+
+        Args:
+            query (str): User query
+            num_results (int): Number of documents to retrieve
+        """
+        if not self.model:
+            logger.error("Gemini model not initialized")
+            yield {"sources": []}
+            yield {"delta": "Error: Gemini API model not initialized. Please check your API key."}
+            return
+
+        try:
+            # Retrieve relevant documents
+            relevant_docs = self.vector_store.similarity_search(query, top_k=num_results)
+            yield {"sources": relevant_docs}
+
+            if not relevant_docs:
+                logger.warning("No relevant documents found for query")
+                yield {"delta": "I couldn't find any relevant information to answer your question. Please try a different query or make sure documents have been processed."}
+                return
+
+            # Create context and prompt, then stream the generation
+            context = self._create_context(relevant_docs)
+            prompt = self._create_prompt(query, context)
+
+            for delta in self._stream_with_gemini(prompt):
+                yield {"delta": delta}
+
+            logger.info(f"Streamed response for query: {query[:50]}...")
+
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            yield {"delta": f"Error generating response: {str(e)}"}
+
     def _create_context(self, relevant_docs):
         """Create context from relevant documents.
         
@@ -91,39 +278,32 @@ class RAGEngine:
         Returns:
             str: Context text
         """
-        context = "Here are some relevant documents to help answer the question:\n\n"
+        # Build once with join instead of repeated += (quadratic copying)
+        parts = ["Here are some relevant documents to help answer the question:\n\n"]
         
         for i, doc in enumerate(relevant_docs):
-            context += f"Document {i+1} (Source: {os.path.basename(doc['source'])}, Pages: {doc['metadata']['page_start']}-{doc['metadata']['page_end']}):\n"
-            context += doc["text"] + "\n\n"
+            md = doc['metadata']
+            parts.append(
+                f"Document {i+1} (Source: {_basename(doc['source'])}, "
+                f"Pages: {md['page_start']}-{md['page_end']}):\n{doc['text']}\n\n"
+            )
         
-        return context
+        return "".join(parts)
     
     def _create_prompt(self, query, context):
         """Membuat prompt untuk model Gemini dalam Bahasa Indonesia.
-    
+        
         Args:
             query (str): Pertanyaan pengguna
             context (str): Konteks hasil pencarian dokumen
-    
+        
         Returns:
             str: Prompt lengkap dalam Bahasa Indonesia
         """
-        prompt = f"""Anda adalah asisten hukum yang ahli dalam hukum Indonesia. Berdasarkan dokumen-dokumen berikut, berikan jawaban yang relevan, jelas, dan mudah dipahami.
-
-    {context}
-
-    Silakan jawab pertanyaan di bawah ini berdasarkan informasi yang terdapat dalam dokumen di atas. Anda boleh menyusun ulang kalimat dengan bahasa Anda sendiri selama maknanya tetap sesuai dengan dokumen. Jangan menambahkan informasi dari luar dokumen. Jika dokumen tidak memuat informasi yang cukup, sampaikan bahwa jawabannya tidak tersedia.
-
-    Question: {query}
-    
-    Answer:"""
+        return _PROMPT_TEMPLATE % (context, query)
     
-        return prompt
-
-    
-    def _generate_with_gemini(self, prompt):
-        """Generate a response using the Gemini API.
+    async def _agenerate_with_gemini(self, prompt):
+        """Generate a response using the async Gemini API.
         
         Args:
             prompt (str): Complete prompt
@@ -131,15 +311,79 @@ class RAGEngine:
         Returns:
             str: Generated response
         """
+        for attempt in range(self.max_retries):
+            try:
+                # First attempt goes through the coalescer; retries call
+                # the API directly so the resubmission cannot queue behind
+                # the very straggler it is escaping
+                if attempt == 0:
+                    call = self._batcher.submit(prompt)
+                else:
+                    call = self.model.generate_content_async(prompt)
+                response = await asyncio.wait_for(call, timeout=self.request_timeout)
+
+                # Extract text from response
+                response_text = response.text if hasattr(response, 'text') else str(response)
+
+                return response_text
+
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Gemini request timed out after {self.request_timeout}s "
+                    f"(attempt {attempt + 1}/{self.max_retries})"
+                )
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+            except Exception as e:
+                logger.error(f"Error in Gemini generation: {str(e)}")
+                return f"Error generating response: {str(e)}"
+
+        return f"Error: Gemini request timed out after {self.max_retries} attempts."
+
+    def _stream_with_gemini(self, prompt):
+        """Stream a response from the Gemini API chunk by chunk.
+
+        Args:
+            prompt (str): Complete prompt
+
+        Yields:
+            str: Partial response text as it is generated
+        """
+        response = None
+        for attempt in range(self.max_retries):
+            future = None
+            try:
+                # The timeout guards request initiation; streaming itself
+                # starts as soon as the first token is available
+                future = self._executor.submit(
+                    self.model.generate_content, prompt, stream=True
+                )
+                response = future.result(timeout=self.request_timeout)
+                break
+            except FutureTimeoutError:
+                # Abandon the attempt; cancel keeps a still-queued call
+                # from occupying a worker (a running one cannot be
+                # interrupted, which is why the pool is sized to
+                # max_retries)
+                future.cancel()
+                logger.warning(
+                    f"Gemini request timed out after {self.request_timeout}s "
+                    f"(attempt {attempt + 1}/{self.max_retries})"
+                )
+            except Exception as e:
+                logger.error(f"Error in Gemini streaming: {str(e)}")
+                yield f"Error generating response: {str(e)}"
+                return
+
+        if response is None:
+            yield f"Error: Gemini request timed out after {self.max_retries} attempts."
+            return
+
         try:
-            # Generate content with the model
-            response = self.model.generate_content(prompt)
-            
-            # Extract text from response
-            response_text = response.text if hasattr(response, 'text') else str(response)
-            
-            return response_text
-            
+            for chunk in response:
+                if getattr(chunk, 'text', None):
+                    yield chunk.text
+
         except Exception as e:
-            logger.error(f"Error in Gemini generation: {str(e)}")
-            return f"Error generating response: {str(e)}"
+            logger.error(f"Error in Gemini streaming: {str(e)}")
+            yield f"Error generating response: {str(e)}"